@@ -4,13 +4,16 @@
 #
 
 
+import functools
+
+
 class check(object):
     """Pseudo-type for ``isinstance()`` checks."""
 
-    def __instanceheck__(self, data):
+    def __instancecheck__(self, data):
         return False
 
-    @property
+    @functools.cached_property
     def __name__(self):
         return self.__class__.__name__
 
@@ -27,7 +30,7 @@ class maybe(check):
     def __instancecheck__(self, data):
         return (data is None or isinstance(data, self.check))
 
-    @property
+    @functools.cached_property
     def __name__(self):
         return "maybe(%s)" % self.check.__name__
 
@@ -41,7 +44,7 @@ class oneof(check):
     def __instancecheck__(self, data):
         return any(isinstance(data, check) for check in self.checks)
 
-    @property
+    @functools.cached_property
     def __name__(self):
         return "oneof(%s)" % \
                 ", ".join(check.__name__ for check in self.checks)
@@ -56,7 +59,7 @@ class choiceof(check):
     def __instancecheck__(self, data):
         return (data in self.values)
 
-    @property
+    @functools.cached_property
     def __name__(self):
         return "choiceof(%s)" % ", ".join(repr(value) for value in self.values)
 
@@ -72,7 +75,7 @@ class listof(check):
         return (isinstance(data, list) and
                 all(isinstance(item, self.item_check) for item in data))
 
-    @property
+    @functools.cached_property
     def __name__(self):
         if self.length is not None:
             return "listof(%s, length=%s)" \
@@ -93,7 +96,7 @@ class tupleof(check):
                 all(isinstance(item, check)
                     for item, check in zip(data, self.checks)))
 
-    @property
+    @functools.cached_property
     def __name__(self):
         return "tupleof(%s)" % ", ".join(check.__name__
                                          for check in self.checks)
@@ -109,10 +112,10 @@ class dictof(check):
     def __instancecheck__(self, data):
         return (isinstance(data, dict) and
                 all(isinstance(key, self.key_check) and
-                    isinstance(data[key], self.value_check)
-                    for key in data))
+                    isinstance(value, self.value_check)
+                    for key, value in data.items()))
 
-    @property
+    @functools.cached_property
     def __name__(self):
         return "dictof(%s, %s)" % (self.key_check.__name__,
                                    self.value_check.__name__)
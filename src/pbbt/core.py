@@ -5,7 +5,7 @@
 
 
 import itertools
-import types
+import sys
 
 
 class registry:
@@ -99,14 +99,28 @@ class RecordMetaclass(type):
         fields = sorted(fields, key=(lambda f: f.order))
         members['__fields__'] = tuple(fields)
         members['__slots__'] = tuple(field.attr for field in fields)
+        # Field properties as parallel tuples, for the loading loops.
+        members['__keys__'] = tuple(field.key for field in fields)
+        members['__key_set__'] = frozenset(members['__keys__'])
+        members['__checks__'] = tuple(field.check for field in fields)
+        members['__defaults__'] = tuple(field.default for field in fields)
+        members['__required__'] = tuple(field.required for field in fields)
+        members['__required_attrs__'] = frozenset(
+                field.attr for field in fields if field.required)
         return type.__new__(mcls, name, bases, members)
 
 
 class Record(object, metaclass=RecordMetaclass):
     """Base class for test input/output data."""
-    __slots__ = ('__weakref__',)
+    __slots__ = ('__weakref__', '__values__')
     __owner__ = None                # test type which owns the record type
     __fields__ = ()                 # list of record fields
+    __keys__ = ()                   # field keys
+    __key_set__ = frozenset()       # set of field keys
+    __checks__ = ()                 # field types
+    __defaults__ = ()               # field default values
+    __required__ = ()               # whether the field is mandatory
+    __required_attrs__ = frozenset()    # attributes of mandatory fields
 
     @classmethod
     def __recognizes__(cls, keys):
@@ -121,30 +135,38 @@ class Record(object, metaclass=RecordMetaclass):
     def __load__(cls, mapping):
         """Generates a record from a mapping of field keys and values."""
         args = []
-        for field in cls.__fields__:
-            if field.key not in mapping:
-                if field.required:
-                    raise ValueError("missing field %r" % field.key)
-                arg = field.default
+        for key, check, default, required in zip(cls.__keys__,
+                                                 cls.__checks__,
+                                                 cls.__defaults__,
+                                                 cls.__required__):
+            if key not in mapping:
+                if required:
+                    raise ValueError("missing field %r" % key)
+                arg = default
             else:
-                arg = mapping.pop(field.key)
-                if field.check is not None and not isinstance(arg, field.check):
+                arg = mapping[key]
+                if check is not None and not isinstance(arg, check):
                     raise ValueError("invalid field %r: expected %s, got %r"
-                                     % (field.key, field.check.__name__, arg))
+                                     % (key, check.__name__, arg))
+                # Share short strings such as names and paths.
+                if type(arg) is str and len(arg) < 64:
+                    arg = sys.intern(arg)
             args.append(arg)
-        if mapping:
-            key = sorted(mapping)[0]
+        if not cls.__key_set__.issuperset(mapping):
+            key = min(set(mapping) - cls.__key_set__)
             raise ValueError("unknown field %r" % key)
         return cls(*args)
 
     def __dump__(self):
         """Generates a list of field keys and values."""
         mapping = []
-        for field in self.__fields__:
-            arg = getattr(self, field.attr)
-            if arg == field.default and not field.required:
+        for key, arg, default, required in zip(self.__keys__,
+                                               self.__values__,
+                                               self.__defaults__,
+                                               self.__required__):
+            if arg == default and not required:
                 continue
-            mapping.append((field.key, arg))
+            mapping.append((key, arg))
         return mapping
 
     def __complements__(self, other):
@@ -160,8 +182,7 @@ class Record(object, metaclass=RecordMetaclass):
 
         # Find a common mandatory field.
         match_field = None
-        other_attrs = set(field.attr for field in other.__fields__
-                                     if field.required)
+        other_attrs = other.__required_attrs__
         for field in self.__fields__:
             if field.required and field.attr in other_attrs:
                 match_field = field
@@ -174,6 +195,35 @@ class Record(object, metaclass=RecordMetaclass):
         other_value = getattr(other, match_field.attr)
         return (value == other_value)
 
+    def __complement_key__(self):
+        """
+        Generates a hashable key such that complementary records have equal
+        keys; returns ``None`` if the key cannot be determined.
+        """
+        if self.__owner__ is None:
+            return None
+
+        # Find input and output record types of the test type.
+        input_type = self.__owner__.__dict__.get('Input')
+        output_type = self.__owner__.__dict__.get('Output')
+        if input_type is None or output_type is None:
+            return (self.__owner__,)
+
+        # Find the common mandatory field `__complements__()` would use.
+        output_attrs = output_type.__required_attrs__
+        for field in input_type.__fields__:
+            if field.required and field.attr in output_attrs:
+                value = getattr(self, field.attr)
+                if isinstance(value, list):
+                    value = tuple(value)
+                key = (self.__owner__, value)
+                try:
+                    hash(key)
+                except TypeError:
+                    return None
+                return key
+        return (self.__owner__,)
+
     def __init__(self, *args, **kwds):
         # Convert any keywords to positional arguments.
         if kwds:
@@ -200,6 +250,9 @@ class Record(object, metaclass=RecordMetaclass):
                             % (len(self.__fields__), len(args)))
         for arg, field in zip(args, self.__fields__):
             setattr(self, field.attr, arg)
+        # Records are immutable, so field values are also kept as a tuple
+        # for iteration, hashing and comparison.
+        self.__values__ = args
 
     def __clone__(self, **kwds):
         """Makes a copy with new values for the given fields."""
@@ -219,19 +272,18 @@ class Record(object, metaclass=RecordMetaclass):
 
     def __iter__(self):
         # Provided so that ``tuple(self)`` works.
-        for field in self.__fields__:
-            yield getattr(self, field.attr)
+        return iter(self.__values__)
 
     def __hash__(self):
-        return hash(tuple(self))
+        return hash(self.__values__)
 
     def __eq__(self, other):
         return (self.__class__ is other.__class__ and
-                tuple(self) == tuple(other))
+                self.__values__ == other.__values__)
 
     def __ne__(self, other):
         return (self.__class__ is not other.__class__ or
-                tuple(self) != tuple(other))
+                self.__values__ != other.__values__)
 
     def __str__(self):
         # Generates printable representation from the first mandatory field.
@@ -254,6 +306,18 @@ class Record(object, metaclass=RecordMetaclass):
                            if value != field.default)))
 
 
+def complement_key(record):
+    # Generates the complement key of a record; returns `None` unless
+    # `__complement_key__()` is overridden together with `__complements__()`,
+    # i.e., it is defined on the same or a more derived class.
+    for base in type(record).__mro__:
+        if '__complement_key__' in base.__dict__:
+            return record.__complement_key__()
+        if '__complements__' in base.__dict__:
+            return None
+    return None
+
+
 def Test(cls):
     """Registers a test type."""
     assert isinstance(cls, type), "a test type must be a class"
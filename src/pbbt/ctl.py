@@ -128,6 +128,8 @@ class Control(object):
         self.state = State(variables or {})
         # Selected suites.
         self.selection = Selection(targets)
+        # Maps output files to flags indicating whether they exist.
+        self.output_exists = {}
 
     def passed(self, text=None):
         """Attests that a test case has passed."""
@@ -159,12 +161,20 @@ class Control(object):
         """Loads input test data from the given file."""
         return load(path, registry.input_types, self.state)
 
+    def has_output(self, path):
+        """Checks if the output file exists."""
+        exists = self.output_exists.get(path)
+        if exists is None:
+            exists = self.output_exists[path] = os.path.exists(path)
+        return exists
+
     def load_output(self, path):
         """Loads output test data from the given file."""
         return load(path, registry.output_types)
 
     def dump_output(self, path, data):
         """Saves output test data to the given file."""
+        self.output_exists[path] = True
         return dump(path, data)
 
     def run(self, case):
@@ -176,7 +186,7 @@ class Control(object):
         # Load input and output data.
         input = self.load_input(input_path)
         output = None
-        if output_path is not None and os.path.exists(output_path):
+        if output_path is not None and self.has_output(output_path):
             output = self.load_output(output_path)
             if not input.__complements__(output):
                 output = None
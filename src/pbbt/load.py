@@ -86,6 +86,8 @@ class TestLoader(BaseYAMLLoader):
         super(TestLoader, self).__init__(stream)
         # List of supported record types.
         self.record_types = record_types
+        # Maps a set of keys to the matching record type.
+        self.record_type_cache = {}
         # Maps names to substitution values.
         self.substitutes = substitutes
         # Indicates that the next node is a test record.
@@ -121,14 +123,6 @@ class TestLoader(BaseYAMLLoader):
 
         return data
 
-    def construct_yaml_str(self, node):
-        # Always return a `!!str`` node as a native string.
-        value = self.construct_scalar(node)
-        try:
-            return str(value)
-        except UnicodeEncodeError:
-            return value.encode('utf-8')
-
     def construct_yaml_seq(self, node):
         if not self.expect_record_list:
             return super(TestLoader, self).construct_yaml_seq(node)
@@ -173,11 +167,16 @@ class TestLoader(BaseYAMLLoader):
         self.expect_record = current_expect_record
 
         # Find a record class matching the set of keys.
-        detected_record_type = None
-        for record_type in self.record_types:
-            if record_type.__recognizes__(set(keys)):
-                detected_record_type = record_type
-                break
+        key_set = frozenset(keys)
+        if key_set in self.record_type_cache:
+            detected_record_type = self.record_type_cache[key_set]
+        else:
+            detected_record_type = None
+            for record_type in self.record_types:
+                if record_type.__recognizes__(key_set):
+                    detected_record_type = record_type
+                    break
+            self.record_type_cache[key_set] = detected_record_type
         if detected_record_type is None:
             if not keys:
                 raise yaml.constructor.ConstructorError(None, None,
@@ -227,10 +226,6 @@ class TestLoader(BaseYAMLLoader):
     def construct_substitute(self, node):
         # Process `${...}` scalars.
         value = self.construct_scalar(node)
-        try:
-            value = str(value)
-        except UnicodeEncodeError:
-            value = value.encode('utf-8')
         match = self.substitute_re.match(value)
         if match is None:
             raise yaml.constructor.ConstructorError(None, None,
@@ -241,8 +236,6 @@ class TestLoader(BaseYAMLLoader):
 
 
 # Register custom constructors.
-TestLoader.add_constructor(
-        'tag:yaml.org,2002:str', TestLoader.construct_yaml_str)
 TestLoader.add_constructor(
         'tag:yaml.org,2002:seq', TestLoader.construct_yaml_seq)
 TestLoader.add_constructor(
@@ -323,20 +316,21 @@ TestDumper.add_implicit_resolver(
 
 
 def load(filename, record_types, substitutes={}):
-    # Loads test input/output data from a file.
-    stream = open(filename, 'r')
-    loader = TestLoader(record_types, substitutes, stream)
-    return loader()
+    # Loads test input/output data from a file.  The file is read as bytes
+    # and decoded by the YAML parser itself.
+    with open(filename, 'rb') as stream:
+        loader = TestLoader(record_types, substitutes, stream)
+        return loader()
 
 
 def dump(filename, record):
     # Saves test output data to a file.
-    stream = open(filename, 'w')
-    stream.write("#\n")
-    stream.write("# This file contains expected test output data"
-                 " generated by PBBT.\n")
-    stream.write("#\n")
-    dumper = TestDumper(stream)
-    return dumper(record)
+    with open(filename, 'w') as stream:
+        stream.write("#\n")
+        stream.write("# This file contains expected test output data"
+                     " generated by PBBT.\n")
+        stream.write("#\n")
+        dumper = TestDumper(stream)
+        return dumper(record)
 
 
@@ -4,42 +4,131 @@
 #
 
 
-from .core import Test, Field, Record
+from .core import Test, Field, Record, complement_key
 from .check import maybe, listof, oneof, dictof
 from .load import locate
 import sys
 import os, os.path
+import collections
+import itertools
+import functools
+import contextlib
 import glob
-import shutil
 import re
 import io
-import subprocess
-import traceback
-import difflib
-import shlex
 
 
-def is_attribute(text, attr_re=re.compile(r'^[A-Za-z_][0-9A-Za-z_]*$')):
+# Matches an attribute name.
+attr_re = re.compile(r'^[A-Za-z_][0-9A-Za-z_]*$')
+# Matches a filename.
+filename_re = re.compile(r'^/?[\w_.-]+(?:/[\w_.-]+)*$')
+# Matches leading and trailing punctuation.
+trim_re = re.compile(r'^[\W_]+|[\W_]+$')
+# Matches punctuation and whitespace between words.
+norm_re = re.compile(r'(?:[^\w.]|_)+')
+
+
+def is_attribute(text):
     # Does it look like an attribute name?
     return (attr_re.match(text) is not None)
 
 
-def is_filename(text,
-                filename_re=re.compile(r'^/?[\w_.-]+(?:/[\w_.-]+)*$')):
+def is_filename(text):
     # Does it look like a filename?
     return (filename_re.match(text) is not None)
 
 
-def to_identifier(text, trim_re=re.compile(r'^[\W_]+|[\W_]+$'),
-                        norm_re=re.compile(r'(?:[^\w.]|_)+')):
-    # Generate an identifier from the given text.
-    for line in text.splitlines():
-        line = norm_re.sub('-', trim_re.sub('', line)).lower()
-        if line:
-            return line
+@contextlib.contextmanager
+def redirect_std(stdin=None, stdout=None, stderr=None):
+    # Temporarily replaces the given standard streams.
+    saved = (sys.stdin, sys.stdout, sys.stderr)
+    if stdin is not None:
+        sys.stdin = stdin
+    if stdout is not None:
+        sys.stdout = stdout
+    if stderr is not None:
+        sys.stderr = stderr
+    try:
+        yield
+    finally:
+        sys.stdin, sys.stdout, sys.stderr = saved
+
+
+def find_files(pattern):
+    # Generate a sorted list of files matching the given pattern.
+    if not any(char in pattern for char in '*?['):
+        # Not a wildcard pattern; no need to scan the directory.
+        return [pattern] if os.path.lexists(pattern) else []
+    return sorted(glob.glob(pattern))
+
+
+@functools.lru_cache(maxsize=1024)
+def to_identifier(text):
+    # Generate an identifier from the given text.  Scan the text one `\n`
+    # chunk at a time so that only the leading lines are ever split.
+    start = 0
+    while start < len(text):
+        end = text.find('\n', start)
+        if end == -1:
+            end = len(text)
+        for line in text[start:end].splitlines():
+            line = norm_re.sub('-', trim_re.sub('', line)).lower()
+            if line:
+                return line
+        start = end+1
     return '-'
 
 
+# Code objects for conditions of `if` and `unless` fields.
+condition_cache = {}
+
+
+def compile_condition(condition):
+    # Compiles a condition expression; reuses previously compiled code.
+    code = condition_cache.get(condition)
+    if code is None:
+        code = compile(condition, '<string>', 'eval')
+        condition_cache[condition] = code
+    return code
+
+
+# Compiled patterns of `ignore` fields.
+ignore_cache = {}
+
+
+def compile_ignore(pattern):
+    # Compiles an `ignore` pattern; reuses previously compiled patterns.
+    ignore_re = ignore_cache.get(pattern)
+    if ignore_re is None:
+        ignore_re = re.compile(pattern, re.X|re.M)
+        ignore_cache[pattern] = ignore_re
+    return ignore_re
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_python(source, filename):
+    # Compiles Python code as an expression or, if that fails, as a module;
+    # reuses previously compiled code.  Returns a pair `(code, is_expr)`.
+    try:
+        return (compile(source, filename, 'eval'), True)
+    except SyntaxError:
+        return (compile(source, filename, 'exec'), False)
+
+
+# Attributes of `coverage.coverage` which indicate that coverage data
+# is saved automatically (the names vary between versions).
+coverage_auto_attrs = ('auto_data', '_auto_data', '_auto_load', '_auto_save')
+
+
+def stop_coverage(coverage):
+    # Stops measuring coverage; saves and combines data if necessary.
+    if coverage._started:
+        coverage.stop()
+    if any(getattr(coverage, attr, None) for attr in coverage_auto_attrs):
+        coverage.save()
+        coverage.combine()
+
+
 class BaseCase(object):
     """
     Template class for all test types.
@@ -53,6 +142,20 @@ class BaseCase(object):
         unless = Field(oneof(str, listof(str)), default=None, order=1e10+3,
                 hint="skip the test if the condition is satisfied")
 
+        @classmethod
+        def __load__(cls, mapping):
+            # Verify that conditions are valid Python expressions.
+            for key in ['if', 'unless']:
+                condition = mapping.get(key)
+                if (isinstance(condition, str) and
+                        not is_attribute(condition)):
+                    try:
+                        compile_condition(condition)
+                    except SyntaxError as exc:
+                        raise ValueError("invalid condition %r: %s"
+                                         % (condition, exc))
+            return super(BaseCase.Input, cls).__load__(mapping)
+
     def __init__(self, ctl, input, output):
         self.ctl = ctl
         self.ui = ctl.ui
@@ -71,26 +174,36 @@ class BaseCase(object):
 
     def skipped(self):
         # Check if preconditions are satisfied.
-        if self.input.skip:
+        input = self.input
+        if input.skip:
             return True
-        for condition, expect in [(self.input.if_, True),
-                                  (self.input.unless, False)]:
-            if condition is None:
-                continue
-            if isinstance(condition, str) and is_attribute(condition):
-                condition = [condition]
-            if isinstance(condition, list):
-                check = any(self.ctl.state.get(key) for key in condition)
-            else:
-                try:
-                    check = bool(eval(condition, self.state))
-                except:
-                    self.ui.literal(traceback.format_exc())
-                    self.ctl.halt("unexpected exception occurred "
-                                  "when evaluating %r" % condition)
-                    return True
-            if check != expect:
+        # Most tests have no conditions.
+        if input.if_ is None and input.unless is None:
+            return False
+        # A condition that failed to evaluate always skips the test.
+        if input.if_ is not None:
+            if self.satisfied(input.if_) is not True:
                 return True
+        if input.unless is not None:
+            if self.satisfied(input.unless) is not False:
+                return True
+        return False
+
+    def satisfied(self, condition):
+        # Evaluates a condition; returns `None` on error.
+        if isinstance(condition, str) and is_attribute(condition):
+            condition = [condition]
+        if isinstance(condition, list):
+            state = self.state
+            return any(state.get(key) for key in condition)
+        try:
+            return bool(eval(compile_condition(condition), self.state))
+        except:
+            import traceback
+            self.ui.literal(traceback.format_exc())
+            self.ctl.halt("unexpected exception occurred "
+                          "when evaluating %r" % condition)
+            return None
 
     def start(self):
         # Display the header.
@@ -115,6 +228,9 @@ class MatchCase(BaseCase):
     Template class for test types which produce output.
     """
 
+    # Maximum number of diff lines to display.
+    max_diff_lines = 2000
+
     class Input:
         ignore = Field(oneof(bool, str), default=False, order=1e5+1,
                 hint="ignore differences between expected and actual output")
@@ -124,7 +240,7 @@ class MatchCase(BaseCase):
             # Verify that `ignore` is a valid regular expression.
             if 'ignore' in mapping and isinstance(mapping['ignore'], str):
                 try:
-                    re.compile(mapping['ignore'], re.X|re.M)
+                    compile_ignore(mapping['ignore'])
                 except re.error as exc:
                     raise ValueError("invalid regular expression: %s" % exc)
             return super(MatchCase.Input, cls).__load__(mapping)
@@ -139,40 +255,40 @@ class MatchCase(BaseCase):
 
     def sanitize(self, text):
         # Remove portions of output matching `ignore` pattern.
-        if self.input.ignore is True:
-            return ""
         if not self.input.ignore:
             return text
-        ignore_re = re.compile(self.input.ignore, re.X|re.M)
+        if self.input.ignore is True:
+            return ""
+        ignore_re = compile_ignore(self.input.ignore)
+        # Without subgroups, the whole match is removed, which does not
+        # need a Python-level replacement function.
+        if not ignore_re.groups:
+            return ignore_re.sub("", text)
         text = ignore_re.sub(self._sanitize_replace, text)
         return text
 
     @staticmethod
     def _sanitize_replace(match):
-        # If `ignore` pattern does not contain subgroups, remove
-        # the whole match.
-        if not match.re.groups:
-            return ""
-        # Otherwise, remove subgroups.
+        # Remove subgroups of a match of an `ignore` pattern with subgroups.
         spans = []
         group_start = match.start()
         for idx in range(match.re.groups):
             start, end = match.span(idx+1)
             if start < end:
-                start -= group_start
-                end -= group_start
-                spans.append((end, start))
+                spans.append((start-group_start, end-group_start))
         spans.sort()
-        spans.reverse()
+        # Collect the text between subgroups; nested and overlapping
+        # subgroups are removed as a whole.
         text = match.group()
-        last_cut = len(text)
-        for end, start in spans:
-            end = min(end, last_cut)
-            if start >= end:
-                continue
-            text = text[:start]+text[end:]
-            last_cut = start
-        return text
+        chunks = []
+        last_cut = 0
+        for start, end in spans:
+            if start > last_cut:
+                chunks.append(text[last_cut:start])
+            if end > last_cut:
+                last_cut = end
+        chunks.append(text[last_cut:])
+        return "".join(chunks)
 
     def compare(self, text, new_text):
         # Display difference between expected and actual output.
@@ -182,10 +298,15 @@ class MatchCase(BaseCase):
         elif text == new_text:
             self.ui.notice("test output has not changed")
         else:
+            import difflib
             diff = difflib.unified_diff(text.splitlines(),
                                         new_text.splitlines(),
                                         n=2, lineterm='')
-            lines = list(diff)[2:]
+            # Skip the `---` and `+++` header lines.
+            lines = list(itertools.islice(diff, 2, 2+self.max_diff_lines))
+            skipped = sum(1 for line in diff)
+            if skipped:
+                lines.append("... (%s more lines)" % skipped)
             self.ui.notice("test output has changed")
             self.ui.literal("\n".join(lines))
 
@@ -200,12 +321,16 @@ class MatchCase(BaseCase):
         if new_output is None:
             self.ctl.failed()
             return
+        # With `ignore: true`, any output matches.
+        if self.input.ignore is True:
+            self.ctl.passed()
+            return
         # Generate text representation of the output.
         text = self.render(self.output)
         new_text = self.render(new_output)
         # Compare expected and actual output; report test failure
-        # if they don't match.
-        if self.sanitize(text) != self.sanitize(new_text):
+        # if they don't match.  Identical texts need no sanitizing.
+        if text != new_text and self.sanitize(text) != self.sanitize(new_text):
             self.compare(text, new_text)
             self.ctl.failed("unexpected test output")
         else:
@@ -222,12 +347,17 @@ class MatchCase(BaseCase):
             if reply == '':
                 self.ctl.halt()
             return self.output
+        # With `ignore: true`, any output matches the expected one.
+        if self.input.ignore is True and self.output is not None:
+            self.ctl.passed()
+            return self.output
         # Generate text representation of the output.
         text = self.render(self.output) if self.output is not None else None
         new_text = self.render(new_output)
         # For new or changed test output, ask the user whether to save/update
         # the output, ignore the difference or halt.
-        if text is None or self.sanitize(text) != self.sanitize(new_text):
+        if text is None or (text != new_text and
+                            self.sanitize(text) != self.sanitize(new_text)):
             self.compare(text, new_text)
             reply = self.ui.choice(None,
                     ('', "record"), ('s', "skip"), ('h', "halt"))
@@ -294,6 +424,9 @@ class SuiteCase(BaseCase):
                 return False
             return self.suite == other.suite
 
+        def __complement_key__(self):
+            return (SuiteCase, self.suite)
+
         def __str__(self):
             return self.title
 
@@ -303,6 +436,9 @@ class SuiteCase(BaseCase):
         tests = Field(listof(Record),
                 hint="test outputs")
 
+        def __complement_key__(self):
+            return (SuiteCase, self.suite)
+
     def __call__(self):
         # Check if the suite was selected.
         if self.input.suite not in self.ctl.selection:
@@ -320,7 +456,8 @@ class SuiteCase(BaseCase):
 
     def load(self):
         # Get expected output.
-        if self.input.output is not None and os.path.exists(self.input.output):
+        if (self.input.output is not None and
+                self.ctl.has_output(self.input.output)):
             output = self.ctl.load_output(self.input.output)
             if self.input.__complements__(output):
                 return output
@@ -334,16 +471,44 @@ class SuiteCase(BaseCase):
         # Input records.
         case_inputs = input.tests
         # Output records.
-        case_outputs = output.tests[:] if output is not None else []
+        case_outputs = output.tests if output is not None else []
+        # Output records that are already matched to some input.
+        taken = [False]*len(case_outputs)
+        # All output records before this index are already matched.
+        start = 0
+        # Maps complement keys to positions of output records; `None` if
+        # some output record cannot generate a key.
+        buckets = {}
+        for idx, case_output in enumerate(case_outputs):
+            key = complement_key(case_output)
+            if key is None:
+                buckets = None
+                break
+            buckets.setdefault(key, collections.deque()).append(idx)
         # Generate triples of `(test_type, input, output)`.
         groups = []
         for case_input in case_inputs:
             case_type = case_input.__owner__
-            for idx, case_output in enumerate(case_outputs):
-                # FIXME: O(N^2).
+            key = None
+            if buckets is not None:
+                key = complement_key(case_input)
+            if key is not None:
+                # Only output records with the same key may complement
+                # the input.
+                candidates = buckets.get(key, ())
+                while candidates and taken[candidates[0]]:
+                    candidates.popleft()
+            else:
+                candidates = range(start, len(case_outputs))
+            for idx in candidates:
+                if taken[idx]:
+                    continue
+                case_output = case_outputs[idx]
                 if case_input.__complements__(case_output):
                     groups.append((case_type, case_input, case_output))
-                    del case_outputs[idx]
+                    taken[idx] = True
+                    while start < len(case_outputs) and taken[start]:
+                        start += 1
                     break
             else:
                 groups.append((case_type, case_input, None))
@@ -386,8 +551,8 @@ class SuiteCase(BaseCase):
 
         # Generate suite output.
 
-        # Original output data.
-        tests = output.tests[:] if output is not None else []
+        # Original output data; never modified in place, so not copied.
+        tests = output.tests if output is not None else []
 
         # If `--purge` is given, generate output from scratch.
         if self.ctl.purging and not self.ctl.halted:
@@ -401,8 +566,11 @@ class SuiteCase(BaseCase):
 
         # Otherwise, update original output data.
         elif new_case_output_map:
-            inserts = []
-            updates = []
+            # Maps a position in the original output to the updated record.
+            updates = {}
+            # Maps a position in the original output to the list of new
+            # records to be inserted before it.
+            inserts = {}
             case_output_index = {}
             for idx, case_output in enumerate(tests):
                 case_output_index[id(case_output)] = idx
@@ -413,25 +581,29 @@ class SuiteCase(BaseCase):
                     if new_case_output is not None:
                         if id(case.output) in case_output_index:
                             idx = case_output_index[id(case.output)]
-                            updates.append((idx, new_case_output))
+                            updates[idx] = new_case_output
                             if idx >= next_idx:
                                 next_idx = idx+1
                         else:
-                            inserts.append((next_idx, new_case_output))
+                            inserts.setdefault(next_idx, []) \
+                                    .append(new_case_output)
                 else:
                     if id(case.output) in case_output_index:
                         idx = case_output_index[id(case.output)]
                         next_idx = idx+1
-            inserts.sort(key=(lambda t: t[0]))
-            for idx, case_output in updates:
-                tests[idx] = case_output
-            for idx, case_output in reversed(inserts):
-                tests.insert(idx, case_output)
+            # Rebuild the output in a single pass.
+            new_tests = []
+            for idx, case_output in enumerate(tests):
+                new_tests.extend(inserts.get(idx, ()))
+                new_tests.append(updates.get(idx, case_output))
+            new_tests.extend(inserts.get(len(tests), ()))
+            tests = new_tests
 
         # Generate new output record.
         if not tests:
             new_output = None
-        elif output is not None and tests == output.tests:
+        elif output is not None and (tests is output.tests or
+                                     tests == output.tests):
             new_output = output
         else:
             new_output = self.Output(suite=self.input.suite, tests=tests)
@@ -537,6 +709,9 @@ class PythonCase(MatchCase):
                 return False
             return (self.py_key == other.py_key)
 
+        def __complement_key__(self):
+            return (PythonCase, self.py_key)
+
         def __str__(self):
             return "PY: %s" % self.py_key
 
@@ -551,57 +726,48 @@ class PythonCase(MatchCase):
             # To match `Input.py_key`.
             return self.py
 
+        def __complement_key__(self):
+            return (PythonCase, self.py_key)
+
     def run(self):
         # Get source code.
         filename = self.input.py_as_filename
         if filename is not None:
             try:
-                stream = open(filename)
-                source = stream.read()
-                stream.close()
+                with open(filename) as stream:
+                    source = stream.read()
             except IOError:
-                self.ui.warning("missing file %r" % source)
+                self.ui.warning("missing file %r" % filename)
                 return
         else:
             source = self.input.py_as_source
             filename = "<%s>" % locate(self.input)
 
         # Execute the code.
-        old_stdin = sys.stdin
-        old_stdout = sys.stdout
-        old_stderr = sys.stderr
-        sys.stdin = io.StringIO(self.input.stdin)
-        sys.stdout = io.StringIO()
-        sys.stderr = sys.stdout
+        stdin_stream = io.StringIO(self.input.stdin)
+        stdout_stream = io.StringIO()
         context = self.state.get('__py__', {}).copy()
         try:
             context['__name__'] = '__main__'
             context['__file__'] = filename
             context['__pbbt__'] = self.state
             exc_info = None
-            try:
+            with redirect_std(stdin_stream, stdout_stream, stdout_stream):
                 try:
-                    code = compile(source, filename, 'eval')
-                    is_expr = True
-                except SyntaxError:
-                    code = compile(source, filename, 'exec')
-                    is_expr = False
-                if is_expr:
-                    output = eval(code, context)
-                    if output is not None:
-                        sys.stdout.write(repr(output)+"\n")
-                else:
-                    exec(code, context)
-            except:
-                exc_info = sys.exc_info()
-                if self.input.except_ is not None and \
-                        self.input.except_ == exc_info[0].__name__:
-                    sys.stdout.write(str(exc_info[1])+"\n")
-            stdout = sys.stdout.getvalue()
+                    code, is_expr = compile_python(source, filename)
+                    if is_expr:
+                        output = eval(code, context)
+                        if output is not None:
+                            stdout_stream.write(repr(output)+"\n")
+                    else:
+                        exec(code, context)
+                except:
+                    exc_info = sys.exc_info()
+                    if self.input.except_ is not None and \
+                            self.input.except_ == exc_info[0].__name__:
+                        stdout_stream.write(str(exc_info[1])+"\n")
+            stdout = stdout_stream.getvalue()
         finally:
-            sys.stdin = old_stdin
-            sys.stdout = old_stdout
-            sys.stderr = old_stderr
             if '__pbbt__' in context:
                 del context['__pbbt__']
             self.state['__py__'] = context
@@ -612,12 +778,17 @@ class PythonCase(MatchCase):
         # Complain if we got an unexpected exception or didn't get an expected
         # exception.
         if exc_info is not None:
+            import traceback
             exc_name = exc_info[0].__name__
-            if self.input.except_ is None or self.input.except_ != exc_name:
+            is_expected = (self.input.except_ == exc_name)
+            if not is_expected:
                 if stdout:
                     self.ui.literal(stdout)
                 self.ui.literal("".join(traceback.format_exception(*exc_info)))
                 self.ui.warning("unexpected exception occured")
+            # Release local variables held by the traceback frames.
+            traceback.clear_frames(exc_info[2])
+            if not is_expected:
                 return
         else:
             if self.input.except_ is not None:
@@ -664,7 +835,9 @@ class ShellCase(MatchCase):
     def run(self):
         # Prepare the command.
         command = self.input.sh
+        # A list is used as is; only a string needs splitting.
         if isinstance(command, str):
+            import shlex
             try:
                 command = shlex.split(command)
             except ValueError:
@@ -672,9 +845,11 @@ class ShellCase(MatchCase):
                 command = [command]
         environ = None
         if self.input.environ:
+            # Not cached: earlier tests may have changed `os.environ`.
             environ = os.environ.copy()
             environ.update(self.input.environ)
         # Execute the command.
+        import subprocess
         try:
             proc = subprocess.Popen(command,
                                     stdin=subprocess.PIPE,
@@ -682,15 +857,13 @@ class ShellCase(MatchCase):
                                     stderr=subprocess.STDOUT,
                                     cwd=self.input.cd,
                                     env=environ)
-            stdout, stderr = proc.communicate(self.input.stdin)
+            stdout, stderr = proc.communicate(self.input.stdin.encode('utf-8'))
         except OSError as exc:
             self.ui.literal(str(exc))
             self.ui.warning("failed to execute the process")
             return
-        # Make sure `stdout` is valid UTF-8 string.
+        # Decode the output, replacing any invalid UTF-8 sequences.
         stdout = stdout.decode('utf-8', 'replace')
-        if not isinstance(stdout, str):
-            stdout = stdout.encode('utf-8')
         # Complain on unexpected exit code.
         if proc.returncode != self.input.exit:
             if stdout:
@@ -715,9 +888,8 @@ class WriteToFileCase(BaseCase):
                 hint="file content")
 
     def check(self):
-        stream = open(self.input.write, 'w')
-        stream.write(self.input.data)
-        stream.close()
+        with open(self.input.write, 'w') as stream:
+            stream.write(self.input.data)
 
 
 @Test
@@ -735,12 +907,12 @@ class ReadFromFileCase(MatchCase):
                 hint="file content")
 
     def run(self):
-        if not os.path.exists(self.input.read):
+        try:
+            with open(self.input.read) as stream:
+                data = stream.read()
+        except (FileNotFoundError, NotADirectoryError):
             self.ui.warning("missing file %r" % self.input.read)
             return
-        stream = open(self.input.read)
-        data = stream.read()
-        stream.close()
         return self.Output(self.input.read, data)
 
     def render(self, output):
@@ -767,8 +939,10 @@ class RemoveFileCase(BaseCase):
         else:
             filenames = self.input.rm
         for filename in filenames:
-            if os.path.exists(filename):
+            try:
                 os.unlink(filename)
+            except (FileNotFoundError, NotADirectoryError):
+                pass
 
 
 @Test
@@ -780,8 +954,7 @@ class MakeDirectoryCase(BaseCase):
                 hint="directory name")
 
     def check(self):
-        if not os.path.isdir(self.input.mkdir):
-            os.makedirs(self.input.mkdir)
+        os.makedirs(self.input.mkdir, exist_ok=True)
 
 
 @Test
@@ -793,8 +966,13 @@ class RemoveDirectoryCase(BaseCase):
                 hint="directory name")
 
     def check(self):
-        if os.path.exists(self.input.rmdir):
+        import shutil
+        try:
             shutil.rmtree(self.input.rmdir)
+        except (FileNotFoundError, NotADirectoryError):
+            # Only a missing directory is not an error.
+            if os.path.exists(self.input.rmdir):
+                raise
 
 
 @Test
@@ -807,7 +985,7 @@ class DoctestCase(BaseCase):
 
     def check(self):
         # Convert the file pattern to a list of files.
-        paths = sorted(glob.glob(self.input.doctest))
+        paths = find_files(self.input.doctest)
         if not paths:
             self.ctl.failed("missing file %r" % self.input.doctest)
             return
@@ -821,16 +999,15 @@ class DoctestCase(BaseCase):
         # Run all tests.
         for path in paths:
             name = os.path.basename(path)
-            text = open(path).read()
+            with open(path) as stream:
+                text = stream.read()
             globs = { '__name__': '__main__' }
             test = parser.get_doctest(text, globs, name, path, 0)
             runner.run(test, out=report_stream.write)
 
         # Prepare test summary.
-        old_stdout = sys.stdout
-        sys.stdout = report_stream
-        result = runner.summarize()
-        self.stdout = old_stdout
+        with redirect_std(stdout=report_stream):
+            result = runner.summarize()
         report = report_stream.getvalue()
 
         # Report failures.
@@ -899,7 +1076,7 @@ class PytestCase(BaseCase):
             return
 
         # Convert the file pattern to a list of files.
-        paths = sorted(glob.glob(self.input.pytest))
+        paths = find_files(self.input.pytest)
         if not paths:
             self.ctl.failed("missing file %r" % self.input.pytest)
             return
@@ -911,10 +1088,8 @@ class PytestCase(BaseCase):
 
         # Redirect output to StringIO and run the test suite.
         report_stream = io.StringIO()
-        old_stdout = sys.stdout
-        sys.stdout = report_stream
-        result = pytest.main(paths+['-q'])
-        sys.stdout = old_stdout
+        with redirect_std(stdout=report_stream):
+            result = pytest.main(paths+['-q'])
         report = report_stream.getvalue()
 
         # Restore terminalwriter.
@@ -996,14 +1171,7 @@ class CoverageCheckCase(BaseCase):
             return
 
         # Stop coverage.
-        if coverage._started:
-            coverage.stop()
-        if getattr(coverage, 'auto_data', None) or \
-           getattr(coverage, '_auto_data', None) or \
-           getattr(coverage, '_auto_load', None) or \
-           getattr(coverage, '_auto_save', None):
-            coverage.save()
-            coverage.combine()
+        stop_coverage(coverage)
 
         # Generate the report.
         report_stream = io.StringIO()
@@ -1033,14 +1201,7 @@ class CoverageReportCase(BaseCase):
             return
 
         # Stop coverage.
-        if coverage._started:
-            coverage.stop()
-        if getattr(coverage, 'auto_data', None) or \
-           getattr(coverage, '_auto_data', None) or \
-           getattr(coverage, '_auto_load', None) or \
-           getattr(coverage, '_auto_save', None):
-            coverage.save()
-            coverage.combine()
+        stop_coverage(coverage)
 
         # Save the report.
         coverage.html_report(directory=self.input.coverage_report)
@@ -5,6 +5,12 @@
 
 
 import sys
+import collections
+
+
+# Separator lines for parts and sections.
+part_line = "="*72+"\n"
+section_line = "-"*72+"\n"
 
 
 class UI(object):
@@ -46,62 +52,54 @@ class UI(object):
 class ConsoleUI(UI):
     """Implements :class:`UI` for console."""
 
+    # Maps a tuple of choices to the set of shortcuts and the prompt line.
+    prompt_cache = {}
+
     def __init__(self, stdin=None, stdout=None, stderr=None):
         self.stdin = stdin or sys.stdin
         self.stdout = stdout or sys.stdout
         self.stderr = stderr or sys.stderr
 
     def part(self):
-        self.stdout.write("="*72+"\n")
-        self.stdout.flush()
+        self.stdout.write(part_line)
 
     def section(self):
-        self.stdout.write("-"*72+"\n")
-        self.stdout.flush()
+        self.stdout.write(section_line)
 
     def header(self, text):
-        for line in text.splitlines():
-            self.stdout.write("  "+line+"\n")
+        self.stdout.write("".join("  "+line+"\n"
+                                  for line in text.splitlines()))
+        # Flush once per test case so that progress is visible even when
+        # the output is not a terminal.
         self.stdout.flush()
 
     def notice(self, text):
-        for line in text.splitlines():
-            self.stdout.write("* "+line+"\n")
-        self.stdout.flush()
+        self.stdout.write("".join("* "+line+"\n"
+                                  for line in text.splitlines()))
 
     def warning(self, text):
-        for line in text.splitlines():
-            self.stdout.write("* "+line+"\n")
+        self.stdout.write("".join("* "+line+"\n"
+                                  for line in text.splitlines()))
         self.stdout.flush()
 
     def error(self, text):
-        for line in text.splitlines():
-            self.stdout.write("! "+line+"\n")
+        self.stdout.write("".join("! "+line+"\n"
+                                  for line in text.splitlines()))
         self.stdout.flush()
 
     def literal(self, text):
-        for line in text.splitlines():
-            self.stdout.write("  "+line+"\n")
-        self.stdout.flush()
+        self.stdout.write("".join("  "+line+"\n"
+                                  for line in text.splitlines()))
 
     def choice(self, text, *choices):
         if text:
-            for line in text.splitlines():
-                self.stdout.write("> "+line+"\n")
-        shortcuts = set()
-        question = ""
-        for shortcut, choice in choices:
-            shortcuts.add(shortcut)
-            if not question:
-                question += "Press"
-            else:
-                question += ","
-            if shortcut:
-                question += " '%s'+ENTER" % shortcut
-            else:
-                question += " ENTER"
-            question += " to %s" % choice
-        self.stdout.write("> "+question+"\n")
+            self.stdout.write("".join("> "+line+"\n"
+                                      for line in text.splitlines()))
+        prompt = self.prompt_cache.get(choices)
+        if prompt is None:
+            prompt = self.prompt_cache[choices] = self.make_prompt(choices)
+        shortcuts, question = prompt
+        self.stdout.write(question)
         self.stdout.flush()
         line = None
         while line not in shortcuts:
@@ -110,6 +108,19 @@ class ConsoleUI(UI):
             line = self.stdin.readline().strip().lower()
         return line
 
+    @staticmethod
+    def make_prompt(choices):
+        # Generates the set of shortcuts and the prompt line for `choice()`.
+        shortcuts = frozenset(shortcut for shortcut, choice in choices)
+        options = []
+        for shortcut, choice in choices:
+            if shortcut:
+                options.append(" '%s'+ENTER to %s" % (shortcut, choice))
+            else:
+                options.append(" ENTER to %s" % choice)
+        question = "> Press"+",".join(options)+"\n"
+        return shortcuts, question
+
 
 class SilentUI(UI):
     """Implements :class:`UI` for use with ``--quiet`` option."""
@@ -117,12 +128,12 @@ class SilentUI(UI):
     def __init__(self, backend):
         # The backend UI.
         self.backend = backend
-        self.queue = []
+        self.queue = collections.deque()
         self.visible = False
 
     def restart(self):
         # Flush the queue.
-        del self.queue[:]
+        self.queue.clear()
         self.visible = False
 
     def force(self):
@@ -132,27 +143,30 @@ class SilentUI(UI):
 
     def process(self):
         if self.visible:
-            for method, args in self.queue:
+            while self.queue:
+                method, args = self.queue.popleft()
                 method(*args)
-            del self.queue[:]
+
+    def show(self, method, *args):
+        # Execute the action if the output is visible; queue it otherwise.
+        if self.visible:
+            method(*args)
+        else:
+            self.queue.append((method, args))
 
     def part(self):
         self.restart()
         self.queue.append((self.backend.part, ()))
-        self.process()
 
     def section(self):
         self.restart()
         self.queue.append((self.backend.section, ()))
-        self.process()
 
     def header(self, text):
-        self.queue.append((self.backend.header, (text,)))
-        self.process()
+        self.show(self.backend.header, text)
 
     def notice(self, text):
-        self.queue.append((self.backend.notice, (text,)))
-        self.process()
+        self.show(self.backend.notice, text)
 
     def warning(self, text):
         self.queue.append((self.backend.warning, (text,)))
@@ -163,8 +177,7 @@ class SilentUI(UI):
         self.force()
 
     def literal(self, text):
-        self.queue.append((self.backend.literal, (text,)))
-        self.process()
+        self.show(self.backend.literal, text)
 
     def choice(self, text, *choices):
         self.force()